@@ -1,15 +1,31 @@
 # Enhanced Video Encoding Script with AV1/HEVC Support
 # Features: GPU acceleration detection, dynamic bitrate control, progress display with time remaining
 
+import argparse
+import collections
+import ctypes
 import os
+import errno
+import functools
+import glob
+import itertools
+import json
 import subprocess
 import sys
 import math
 import shutil
-import re
+import stat
 import platform
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+# Unit constants used when formatting sizes and durations
+_MB = 1 << 20
+_SEC_PER_HOUR = 3600
+
 def get_validated_integer_input(prompt, default_value=None, min_value=None, max_value=None):
     """Validate integer input with range checks and default values"""
     while True:
@@ -38,48 +54,37 @@ def get_validated_integer_input(prompt, default_value=None, min_value=None, max_
         except ValueError:
             print("Please enter a valid integer")
 
+# Common FFmpeg install locations, checked when ffmpeg is not on PATH
+if platform.system() == "Windows":
+    FFMPEG_FALLBACK_PATHS = (
+        os.path.join(os.environ.get("ProgramFiles", "C:\\Program Files"), "ffmpeg", "bin", "ffmpeg.exe"),
+        os.path.join(os.environ.get("ProgramFiles(x86)", "C:\\Program Files (x86)"), "ffmpeg", "bin", "ffmpeg.exe")
+    )
+elif platform.system() == "Darwin":  # macOS
+    FFMPEG_FALLBACK_PATHS = (
+        "/usr/local/bin/ffmpeg",
+        "/opt/homebrew/bin/ffmpeg",
+        "/opt/local/bin/ffmpeg"
+    )
+else:  # Linux and others
+    FFMPEG_FALLBACK_PATHS = (
+        "/usr/bin/ffmpeg",
+        "/usr/local/bin/ffmpeg",
+        "/opt/ffmpeg/bin/ffmpeg"
+    )
+
+# Resolved tool paths, filled in once by find_tools()
+_TOOLS = {}
+
 def find_ffmpeg_path():
     """Locate FFmpeg executable across different operating systems"""
-    system = platform.system()
-    
     # Try to find ffmpeg in PATH first (works on all platforms)
-    try:
-        if system == "Windows":
-            # Windows-specific search using 'where'
-            ffmpeg_path = subprocess.check_output(["where", "ffmpeg"], stderr=subprocess.DEVNULL).decode().strip()
-        else:
-            # Unix-like systems (Linux, macOS) use 'which'
-            ffmpeg_path = subprocess.check_output(["which", "ffmpeg"], stderr=subprocess.DEVNULL).decode().strip()
-        
-        if ffmpeg_path:
-            print(f"FFmpeg found at: {ffmpeg_path}")
-            return ffmpeg_path
-    except subprocess.CalledProcessError:
-        pass
+    ffmpeg_path = shutil.which("ffmpeg")
+    if ffmpeg_path:
+        print(f"FFmpeg found at: {ffmpeg_path}")
+        return ffmpeg_path
 
-    # Platform-specific common installation paths
-    common_paths = []
-    
-    if system == "Windows":
-        # Windows common paths
-        common_paths = [
-            os.path.join(os.environ.get("ProgramFiles", "C:\\Program Files"), "ffmpeg", "bin", "ffmpeg.exe"),
-            os.path.join(os.environ.get("ProgramFiles(x86)", "C:\\Program Files (x86)"), "ffmpeg", "bin", "ffmpeg.exe")
-        ]
-    elif system == "Darwin":  # macOS
-        common_paths = [
-            "/usr/local/bin/ffmpeg",
-            "/opt/homebrew/bin/ffmpeg",
-            "/opt/local/bin/ffmpeg"
-        ]
-    else:  # Linux and others
-        common_paths = [
-            "/usr/bin/ffmpeg",
-            "/usr/local/bin/ffmpeg",
-            "/opt/ffmpeg/bin/ffmpeg"
-        ]
-    
-    for path in common_paths:
+    for path in FFMPEG_FALLBACK_PATHS:
         if os.path.isfile(path):
             print(f"FFmpeg found at: {path}")
             return path
@@ -87,107 +92,280 @@ def find_ffmpeg_path():
     print("FFmpeg not found. Please install FFmpeg and ensure it's available in your PATH.")
     sys.exit(1)
 
-def check_gpu_acceleration(ffmpeg_path):
-    """Verify hardware acceleration support through codec list"""
+def find_tools():
+    """Locate FFmpeg and ffprobe once and cache their paths"""
+    if not _TOOLS:
+        ffmpeg = Path(find_ffmpeg_path())
+        # Prefer the ffprobe shipped next to ffmpeg so both come from the same build
+        ffprobe = ffmpeg.with_name("ffprobe" + ffmpeg.suffix)
+        if not ffprobe.is_file():
+            ffprobe = shutil.which("ffprobe") or ffprobe
+        _TOOLS.update(ffmpeg=str(ffmpeg), ffprobe=str(ffprobe))
+    return _TOOLS
+
+# Hardware encoder name suffixes, mapped to the GPU vendor that provides them
+GPU_ENCODER_SUFFIXES = {
+    "nvidia": "_nvenc",
+    "amd": "_amf",
+    "intel": "_qsv",
+    "apple": "_videotoolbox",
+}
+
+# NVENC replacements for the CPU encoders offered in the menu
+NVENC_CODECS = {
+    "libsvtav1": "av1_nvenc",
+    "libx265": "hevc_nvenc",
+    "libx264": "h264_nvenc",
+}
+
+def test_encoder(ffmpeg_path, encoder, vf=None):
+    """Check that an encoder (and optionally a filter chain) really works here with a one-frame test encode"""
+    test_cmd = [
+        ffmpeg_path, "-hide_banner", "-v", "error",
+        "-f", "lavfi", "-i", "nullsrc=s=256x256",
+        "-frames:v", "1"
+    ]
+    # The filter chain decides the pixel format; plain 8-bit input otherwise
+    test_cmd += ["-vf", vf] if vf else ["-pix_fmt", "yuv420p"]
+    test_cmd += ["-c:v", encoder, "-f", "null", "-"]
+    try:
+        subprocess.run(test_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=30, check=True)
+        return True
+    except (subprocess.SubprocessError, OSError):
+        return False
+
+def check_gpu_acceleration(ffmpeg_path, encoding_command):
+    """Detect the GPU vendor whose hardware encoder actually works on this machine"""
+    # Builds often list NVENC, AMF and QSV together, so listed encoders are only
+    # trusted after a test encode. "nvidia" means the NVENC replacement for the
+    # chosen codec works behind the same CUDA upload/scale/10-bit chain the
+    # encode itself uses, so builds lacking a capable scale_cuda stay on the CPU.
     try:
-        output = subprocess.check_output([ffmpeg_path, "-codecs"], stderr=subprocess.DEVNULL).decode()
-        if "hwaccel" in output:
-            print("GPU acceleration is supported.")
-            return True
-    except subprocess.CalledProcessError:
+        output = subprocess.check_output([ffmpeg_path, "-hide_banner", "-encoders"], stderr=subprocess.DEVNULL).decode()
+        # Encoder names are the second column of each listing line
+        encoders = {fields[1] for fields in (line.split() for line in output.splitlines()) if len(fields) > 1}
+        nvenc_codec = NVENC_CODECS.get(encoding_command)
+        if nvenc_codec in encoders and test_encoder(ffmpeg_path, nvenc_codec, build_vf("nvidia", 256, hw_decode=False)):
+            print(f"GPU acceleration is supported (nvidia, {nvenc_codec}).")
+            return "nvidia"
+        # Other vendors are only used for hardware decoding (-hwaccel auto)
+        for vendor, suffix in GPU_ENCODER_SUFFIXES.items():
+            if vendor == "nvidia":
+                continue
+            listed = [f"{codec}{suffix}" for codec in ("h264", "hevc", "av1") if f"{codec}{suffix}" in encoders]
+            if listed and test_encoder(ffmpeg_path, listed[0]):
+                print(f"GPU acceleration is supported ({vendor}).")
+                return vendor
+    except (subprocess.CalledProcessError, OSError):
         pass
 
     print("GPU acceleration is not supported or could not be detected.")
-    return False
+    return None
 
-def get_video_info(ffmpeg_path, input_file):
+def get_video_info(ffprobe_path, input_file):
     """Extract video information using ffprobe for better efficiency"""
     try:
-        # Adjust ffprobe path based on ffmpeg path
-        system = platform.system()
-        if system == "Windows":
-            ffprobe_path = ffmpeg_path.replace("ffmpeg.exe", "ffprobe.exe")
-        else:
-            ffprobe_path = ffmpeg_path.replace("ffmpeg", "ffprobe")
-        
-        # Use ffprobe to get duration and FPS data
-        probe_cmd = [
+        # Key the cache on modification time so a changed file is probed again
+        return _probe_video(ffprobe_path, input_file, os.path.getmtime(input_file))
+    except Exception as e:
+        print(f"Error getting video info: {str(e)}")
+        return {
+            "frame_count": None,
+            "fps": None,
+            "duration": None,
+            "codec_name": None,
+            "pix_fmt": None
+        }
+
+def probe_all(ffprobe_path, videos):
+    """Probe every input up front, running several ffprobe processes at once"""
+    # ffprobe accepts a single input, so overlap the per-file process startup instead
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        infos = executor.map(lambda video: get_video_info(ffprobe_path, video), videos)
+        return dict(zip(videos, infos))
+
+@functools.lru_cache(maxsize=64)
+def _probe_video(ffprobe_path, input_file, mtime):
+    """Run ffprobe for frame count, FPS and duration (cached per file and mtime)"""
+    # Stream and container fields in a single ffprobe call
+    probe_cmd = [
+        ffprobe_path,
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=codec_name,pix_fmt,r_frame_rate,duration,nb_frames:format=duration",
+        "-of", "json",
+        input_file
+    ]
+    
+    probe_output = json.loads(subprocess.check_output(probe_cmd, universal_newlines=True))
+    stream = probe_output["streams"][0]
+    
+    # Parse frame rate
+    fps_fraction = stream["r_frame_rate"]
+    if '/' in fps_fraction:
+        num, den = map(int, fps_fraction.split('/'))
+        fps = num / den
+    else:
+        fps = float(fps_fraction)
+    
+    # Stream duration is missing for MKV files, fall back to the container duration
+    duration = None
+    for value in (stream.get("duration"), probe_output.get("format", {}).get("duration")):
+        if value and value != 'N/A':
+            duration = float(value)
+            break
+    
+    # Prefer the frame count reported by the container
+    frame_count = None
+    if stream.get("nb_frames", 'N/A') != 'N/A':
+        frame_count = int(stream["nb_frames"])
+    
+    # Otherwise count packets; this demuxes the file but never decodes it (unlike -count_frames)
+    if not frame_count:
+        count_cmd = [
             ffprobe_path,
             "-v", "error",
             "-select_streams", "v:0",
-            "-show_entries", "stream=r_frame_rate,duration",
+            "-count_packets",
+            "-show_entries", "stream=nb_read_packets",
             "-of", "csv=p=0",
             input_file
         ]
-        
-        probe_output = subprocess.check_output(probe_cmd, universal_newlines=True).strip().split(',')
-        
-        # Parse frame rate
-        fps_fraction = probe_output[0]
-        if '/' in fps_fraction:
-            num, den = map(int, fps_fraction.split('/'))
-            fps = num / den
-        else:
-            fps = float(fps_fraction)
-        
-        # Parse duration - handle 'N/A' case
-        duration = None
-        if len(probe_output) > 1 and probe_output[1] != 'N/A':
-            duration = float(probe_output[1])
-        
-        # If duration is None, try an alternative approach for MKV files
-        if duration is None:
-            # Try to get duration from format information instead
-            alt_probe_cmd = [
-                ffprobe_path,
-                "-v", "error",
-                "-show_entries", "format=duration",
-                "-of", "csv=p=0",
-                input_file
-            ]
-            
-            try:
-                alt_duration = subprocess.check_output(alt_probe_cmd, universal_newlines=True).strip()
-                if alt_duration and alt_duration != 'N/A':
-                    duration = float(alt_duration)
-            except:
-                # If that also fails, we'll continue with duration as None
-                pass
-        
-        # Calculate frame count from duration and fps
+        try:
+            packets = subprocess.check_output(count_cmd, universal_newlines=True).strip()
+            if packets.isdigit():
+                frame_count = int(packets)
+        except subprocess.CalledProcessError:
+            pass
+    
+    # Last resort: estimate frame count from duration and fps
+    if not frame_count:
         frame_count = int(duration * fps) if duration and fps else None
-        
-        return {
-            "frame_count": frame_count,
-            "fps": fps,
-            "duration": duration
-        }
-    except Exception as e:
-        print(f"Error getting video info: {str(e)}")
-        return {
-            "frame_count": None,
-            "fps": None,
-            "duration": None
-        }
+    
+    return {
+        "frame_count": frame_count,
+        "fps": fps,
+        "duration": duration,
+        "codec_name": stream.get("codec_name"),
+        "pix_fmt": stream.get("pix_fmt")
+    }
+
+def parse_progress_value(value, suffix=b""):
+    """Convert a raw value from FFmpeg's -progress output to float, treating N/A as 0"""
+    try:
+        return float(value.removesuffix(suffix).decode())
+    except (AttributeError, ValueError):
+        return 0.0
+
+# Every possible bar at the default width, built once
+_BARS = tuple('█' * i + '░' * (20 - i) for i in range(21))
 
 def create_progress_bar(progress, width=20):
     """Create a simple text-based progress bar"""
-    filled_width = int(width * progress / 100)
-    bar = '█' * filled_width + '░' * (width - filled_width)
-    return bar
+    filled_width = min(width, max(0, int(width * progress / 100)))
+    if width == 20:
+        return _BARS[filled_width]
+    return '█' * filled_width + '░' * (width - filled_width)
+
+def get_env_int(name, default):
+    """Read a positive integer setting from the environment, warning and using the default if invalid"""
+    value = os.environ.get(name)
+    if not value:
+        return default
+    try:
+        number = int(value)
+        if number >= 1:
+            return number
+    except ValueError:
+        pass
+    print(f"Warning: ignoring invalid {name}={value!r}, using {default if default is not None else 'automatic'}")
+    return default
+
+def positive_int(value):
+    """argparse type for options that need an integer of at least 1"""
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {value!r}")
+    return number
+
+def get_encoder_threads():
+    """Per-encode thread cap from ENCODER_THREADS (set by --threads), or None for automatic"""
+    return get_env_int("ENCODER_THREADS", None)
+
+def get_svtav1_cores(parallel_jobs=1):
+    """Number of SVT-AV1 threads (lp) per encode, shared out across parallel jobs"""
+    threads = get_encoder_threads()
+    if threads:
+        return threads
+    if parallel_jobs > 1:
+        return max(1, os.cpu_count() // (2 * parallel_jobs))
+    return get_default_cores()
+
+def get_default_cores():
+    """CPU cores one encode uses by default, ignoring any --threads cap"""
+    return max(4, min(8, math.floor(os.cpu_count() / 2)))
+
+def get_x265_threads(parallel_jobs=1):
+    """x265 thread pool size and frame threads per encode, shared out across parallel jobs"""
+    pools = get_encoder_threads() or max(1, os.cpu_count() // parallel_jobs)
+    return pools, max(1, min(8, pools // 2))
+
+def get_worker_count(encoding_command, gpu_vendor):
+    """Number of videos to encode concurrently without oversubscribing the CPU or NVENC"""
+    if gpu_vendor == "nvidia" and encoding_command in NVENC_CODECS:
+        # Consumer NVIDIA cards limit the number of simultaneous NVENC sessions
+        return get_env_int("NVENC_SESSIONS", 2)
+    # Based on the default per-job usage so --threads only ever lowers the load of each job
+    return max(1, os.cpu_count() // get_default_cores())
 
-def encode_video(video_name, input_path, output_path, encoding_command, crf, preset, keyframe_interval, gpu_acceleration, max_bitrate=None):
+def init_worker(tools):
+    """Share the already located tool paths with encodes running in worker processes"""
+    _TOOLS.update(tools)
+
+# Input formats NVDEC can decode; anything else silently falls back to software decoding
+NVDEC_8BIT_CODECS = {"h264", "hevc", "av1", "vp8", "vp9", "mpeg1video", "mpeg2video", "vc1"}
+NVDEC_10BIT_CODECS = {"hevc", "av1", "vp9"}
+
+def is_nvdec_decodable(video_info):
+    """Whether the input's video stream can be decoded on the GPU (4:2:0 only)"""
+    codec_name = video_info.get("codec_name")
+    pix_fmt = video_info.get("pix_fmt")
+    if pix_fmt in ("yuv420p", "yuvj420p", "nv12"):
+        return codec_name in NVDEC_8BIT_CODECS
+    if pix_fmt in ("yuv420p10le", "p010le"):
+        return codec_name in NVDEC_10BIT_CODECS
+    return False
+
+def build_vf(gpu_vendor, target_width, hw_decode=True):
+    """Build the scaling filter, keeping frames in VRAM on the CUDA path"""
+    if gpu_vendor == "nvidia":
+        # Decoded CUDA surfaces are scaled and converted to 10-bit on the GPU
+        scale = f"scale_cuda={target_width}:-2:format=p010le"
+        # Software-decoded frames are uploaded once and scaled on the GPU from there
+        return scale if hw_decode else f"hwupload_cuda,{scale}"
+    return f"scale={target_width}:-1"
+
+def encode_video(video_name, input_path, output_path, encoding_command, crf, preset, keyframe_interval, gpu_vendor, max_bitrate=None, parallel_jobs=1, original_size=None, *, video_info, output_stem=None, progress_log=None):
     """Core encoding function with progress monitoring and time remaining calculation"""
     input_file = os.path.join(input_path, video_name)
-    output_file = os.path.join(output_path, f"{Path(video_name).stem} encoded av1.mkv")
+    output_file = os.path.join(output_path, f"{output_stem or Path(video_name).stem} encoded av1.mkv")
     
-    if not os.path.isfile(input_file):
-        print(f"Input not found: {input_file}")
-        return None, None
+    # Callers that already stat'ed the input pass its size in
+    if original_size is None:
+        try:
+            input_stat = os.stat(input_file)
+        except OSError:
+            input_stat = None
+        if input_stat is None or not stat.S_ISREG(input_stat.st_mode):
+            print(f"Input not found: {input_file}")
+            return None, None
+        original_size = input_stat.st_size
 
-    # Get video information before encoding
-    print("Analyzing video to calculate total frames...")
-    video_info = get_video_info(ffmpeg_path, input_file)
+    # Video information is probed by the caller
+    tools = find_tools()
     total_frames = video_info["frame_count"]
     video_fps = video_info["fps"]
     
@@ -196,135 +374,167 @@ def encode_video(video_name, input_path, output_path, encoding_command, crf, pre
     else:
         print("Could not determine total frames, time remaining will not be shown")
 
-    # Base FFmpeg command
-    ffmpeg_cmd = [
-        ffmpeg_path, "-y", "-i", input_file, "-map", "0",
-        "-vf", "scale=1920:-1", 
-        "-c:v", encoding_command,
-        "-crf", str(crf),
-        "-preset", str(preset),
+    # Route to the NVENC hardware encoder when an NVIDIA GPU is available
+    codec = encoding_command
+    if gpu_vendor == "nvidia":
+        codec = NVENC_CODECS.get(encoding_command, encoding_command)
+
+    # Input options (must come before -i)
+    ffmpeg_cmd = [tools["ffmpeg"], "-y"]
+    hw_decode = gpu_vendor != "nvidia" or is_nvdec_decodable(video_info)
+    if gpu_vendor == "nvidia":
+        if hw_decode:
+            ffmpeg_cmd += ["-hwaccel", "cuda", "-hwaccel_output_format", "cuda"]
+    elif gpu_vendor:
+        ffmpeg_cmd += ["-hwaccel", "auto"]
+    ffmpeg_cmd += ["-i", input_file]
+
+    # Output options
+    ffmpeg_cmd += [
+        "-c:v", codec,
+        "-map", "0",
+        "-vf", build_vf(gpu_vendor, 1920, hw_decode),
+    ]
+
+    # Rate control and preset differ between NVENC and the software encoders
+    if codec == "av1_nvenc":
+        ffmpeg_cmd += ["-rc", "vbr", "-cq", str(crf), "-preset", "p4", "-tune", "hq", "-b:v", "0"]
+        if max_bitrate:
+            ffmpeg_cmd += ["-maxrate", f"{max_bitrate}k"]
+    elif codec.endswith("_nvenc"):
+        ffmpeg_cmd += ["-rc", "constqp", "-qp", str(crf), "-preset", "p4", "-tune", "hq"]
+    else:
+        ffmpeg_cmd += ["-crf", str(crf), "-preset", str(preset)]
+
+    # The CUDA filter chain already outputs p010le, so only software frames need -pix_fmt
+    if gpu_vendor == "nvidia":
+        if codec == "hevc_nvenc":
+            ffmpeg_cmd += ["-profile:v", "main10"]
+    else:
+        ffmpeg_cmd += ["-pix_fmt", "yuv420p10le"]
+
+    ffmpeg_cmd += [
         "-g", str(keyframe_interval),
-        "-pix_fmt", "yuv420p10le",
-        "-c:a", "copy"
+        "-c:a", "copy",
+        "-nostats", "-progress", "pipe:1"
     ]
 
-    # Add GPU acceleration if available
-    if gpu_acceleration:
-        ffmpeg_cmd += ["-hwaccel", "auto"]
+    # NVENC lookahead and adaptive quantization only affect the VBR path; every GPU
+    # that can run av1_nvenc supports them, unlike older cards used for hevc_nvenc
+    if codec == "av1_nvenc":
+        ffmpeg_cmd += [
+            "-rc-lookahead", "32",
+            "-spatial-aq", "1",
+            "-temporal-aq", "1",
+            "-multipass", "fullres",
+            "-b_ref_mode", "middle"
+        ]
+
+    # x265 specific parameters; its own detection leaves cores idle on large machines
+    if codec == "libx265":
+        pools, frame_threads = get_x265_threads(parallel_jobs)
+        ffmpeg_cmd += ["-x265-params", f"pools={pools}:frame-threads={frame_threads}"]
 
     # SVT-AV1 specific parameters
-    if encoding_command == "libsvtav1":
-        cores = max(4, min(8, math.floor(os.cpu_count() / 2)))
+    if codec == "libsvtav1":
+        cores = get_svtav1_cores(parallel_jobs)
         svtav1_params = f"lp={cores}:mbr={max_bitrate}:enable-stat-report=1:tune=1:enable-overlays=1:enable-tf=1:scd=1"
         ffmpeg_cmd += ["-svtav1-params", svtav1_params]
 
-    ffmpeg_cmd.append(output_file)
+    # Reserve the final name up front so an existing file or another queued job is never overwritten
+    claimed_file = claim_output_file(output_file)
+    if claimed_file != output_file:
+        print(f"'{output_file}' already exists, writing to '{claimed_file}' instead")
+        output_file = claimed_file
+
+    # Encode into a private directory so a half-written file never appears under the final name
+    work_dir = tempfile.mkdtemp(prefix=".encode-", dir=output_path)
+    temp_file = os.path.join(work_dir, os.path.basename(output_file))
+    ffmpeg_cmd.append(temp_file)
+    encoded = False
 
     try:
         # Convert all elements to strings to prevent type errors
         ffmpeg_cmd_str = [str(item) for item in ffmpeg_cmd]
         print(f"Starting FFmpeg process with command: {' '.join(ffmpeg_cmd_str)}")
         
-        # Use subprocess.Popen with appropriate redirects for real-time output
+        # Progress arrives as key=value lines on stdout; log messages come on stderr.
+        # The pipes are read as bytes and only the values shown are decoded.
         process = subprocess.Popen(
             ffmpeg_cmd_str, 
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.STDOUT, 
-            universal_newlines=True, 
-            bufsize=1
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
         )
+        stderr_thread = threading.Thread(target=relay_stderr, args=(process.stderr, progress_log), daemon=True)
+        stderr_thread.start()
         
-        # Real-time progress display
-        while True:
-            line = process.stdout.readline()
-            if not line and process.poll() is not None:
-                break
+        video_duration_formatted = format_duration(video_info["duration"])
+        progress_state = {}
+        last_render = 0.0
+        
+        # Real-time progress display, rendered once per complete progress block
+        for line in process.stdout:
+            # Keep the raw lines for the log file; the deque drops the oldest ones
+            if progress_log is not None:
+                progress_log.append(line)
+            key, _, value = line.rstrip().partition(b'=')
+            progress_state[key] = value
+            if key != b"progress":
+                continue
             
-            # Strip the line 
-            line = line.strip()
-            if line:
-                # Enhanced progress display formatting
-                if line.startswith("frame="):
-                    # Extract the frame number
-                    frame_match = re.search(r'frame=\s*(\d+)', line)
-                    # Extract the encoding speed
-                    speed_match = re.search(r'speed=\s*([\d.]+)x', line)
-                    # Extract fps
-                    fps_match = re.search(r'fps=\s*(\d+)', line)
-                    # Extract current file size
-                    size_match = re.search(r'size=\s*(\d+)KiB', line)
-                    # Extract encoded time
-                    time_match = re.search(r'time=(\d+):(\d+):(\d+\.\d+)', line)
-                    # Extract bitrate
-                    bitrate_match = re.search(r'bitrate=\s*([\d.]+)kbits/s', line)
-                    
-                    encoding_speed = 0
-                    if speed_match:
-                        encoding_speed = float(speed_match.group(1))
-                        
-                    # Parse additional information
-                    current_fps = int(fps_match.group(1)) if fps_match else 0
-                    current_size_kb = int(size_match.group(1)) if size_match else 0
-                    current_size_mb = current_size_kb / 1024  # Convert to MB
-                    
-                    # Parse time (HH:MM:SS)
-                    encoded_time = "00:00:00"
-                    if time_match:
-                        hours = time_match.group(1)
-                        minutes = time_match.group(2)
-                        seconds = time_match.group(3)
-                        # Remove decimal from seconds
-                        seconds_int = seconds.split('.')[0]
-                        encoded_time = f"{hours}:{minutes}:{seconds_int}"
-                        
-                    # Parse bitrate
-                    current_bitrate = 0
-                    if bitrate_match:
-                        current_bitrate = float(bitrate_match.group(1))
+            # Redraw at most every 250 ms, but always show the final update
+            now = time.monotonic()
+            if value != b"end" and now - last_render < 0.25:
+                continue
+            last_render = now
+            
+            current_frame = int(parse_progress_value(progress_state.get(b"frame")))
+            current_fps = int(parse_progress_value(progress_state.get(b"fps")))
+            encoding_speed = parse_progress_value(progress_state.get(b"speed"), b"x")
+            current_bitrate = parse_progress_value(progress_state.get(b"bitrate"), b"kbits/s")
+            current_size_mb = parse_progress_value(progress_state.get(b"total_size")) / _MB
+            # Remove microseconds from the encoded time (HH:MM:SS.ffffff)
+            encoded_time = progress_state.get(b"out_time", b"00:00:00").split(b'.')[0].decode()
+            
+            if current_frame and total_frames and video_fps and encoding_speed > 0:
+                remaining_frames = total_frames - current_frame
+                # Calculate time remaining (considering encoding speed)
+                seconds_remaining = max(0, remaining_frames / (video_fps * encoding_speed))
+                # Format time with leading zeros (HH:MM:SS)
+                time_remaining = format_duration(seconds_remaining)
+                # Calculate progress percentage
+                progress_percent = (current_frame / total_frames) * 100
+                # Create progress bar
+                progress_bar = create_progress_bar(progress_percent)
+                # Estimate new file size from the size FFmpeg reports in the same progress block
+                estimated_final_size_mb = current_size_mb / (progress_percent / 100) if progress_percent > 0 else 0
+                # Format a fixed-width progress display with additional information
+                enhanced_progress = (
+                    f"\rFrame: {current_frame:6d}/{total_frames:6d} | "
+                    f"{progress_bar} {progress_percent:5.1f}% | "
+                    f"{current_fps:3d}fps | "
+                    f"{encoding_speed:3.1f}x | "
+                    f"Bitrate: {current_bitrate:6.1f}kb/s | "
+                    f"{current_size_mb:5.1f}MB / est. {estimated_final_size_mb:6.1f}MB | "
+                    f"Encoded: {encoded_time} / {video_duration_formatted} | "
+                    f"est. {time_remaining} remaining"
                     
-                    if frame_match and total_frames and video_fps and encoding_speed > 0:
-                        current_frame = int(frame_match.group(1))
-                        remaining_frames = total_frames - current_frame
-                        # Calculate time remaining (considering encoding speed)
-                        seconds_remaining = int(remaining_frames / (video_fps * encoding_speed))
-                        # Format time with leading zeros (HH:MM:SS)
-                        hours_remaining = seconds_remaining // 3600
-                        minutes_remaining = (seconds_remaining % 3600) // 60
-                        seconds_remaining = seconds_remaining % 60
-                        time_remaining = f"{hours_remaining:02d}:{minutes_remaining:02d}:{seconds_remaining:02d}"
-                        # Calculate progress percentage
-                        progress_percent = (current_frame / total_frames) * 100
-                        # Create progress bar
-                        progress_bar = create_progress_bar(progress_percent)
-                        # Estimate new file size
-                        if os.path.exists(output_file):
-                            current_output_size = os.path.getsize(output_file)
-                            estimated_final_size = current_output_size / (progress_percent / 100) if progress_percent > 0 else 0
-                            estimated_final_size_mb = estimated_final_size / (1024 ** 2)  # Convert to MB
-                        else:
-                            estimated_final_size_mb = 0
-                        # Format video duration properly
-                        video_duration_formatted = format_duration(video_info["duration"])
-                        # Format a fixed-width progress display with additional information
-                        enhanced_progress = (
-                            f"\rFrame: {current_frame:6d}/{total_frames:6d} | "
-                            f"{progress_bar} {progress_percent:5.1f}% | "
-                            f"{current_fps:3d}fps | "
-                            f"{encoding_speed:3.1f}x | "
-                            f"Bitrate: {current_bitrate:6.1f}kb/s | "
-                            f"{current_size_mb:5.1f}MB / est. {estimated_final_size_mb:6.1f}MB | "
-                            f"Encoded: {encoded_time} / {video_duration_formatted} | "
-                            f"est. {time_remaining} remaining"
-                            
-                        )
-                        # Keep the line on the same line with carriage return
-                        print(enhanced_progress, end='', flush=True)
-                    else:
-                        # If we couldn't calculate time remaining, just print the original line
-                        print(f"\r{line}", end='', flush=True)
-                else:
-                    # Other output on new lines
-                    print(line)
+                )
+                # Keep the line on the same line with carriage return
+                sys.stdout.write(enhanced_progress)
+            else:
+                # If we couldn't calculate time remaining, show the raw counters
+                sys.stdout.write(
+                    f"\rframe={current_frame} fps={current_fps} size={current_size_mb:.1f}MB "
+                    f"time={encoded_time} bitrate={current_bitrate:.1f}kbits/s speed={encoding_speed:.2f}x"
+                )
+            sys.stdout.flush()
+            
+            if value == b"end":
+                break
+        
+        process.wait()
+        stderr_thread.join()
         
         # Get return code
         return_code = process.poll()
@@ -332,33 +542,95 @@ def encode_video(video_name, input_path, output_path, encoding_command, crf, pre
             print(f"\nFFmpeg process exited with error code {return_code}")
             return None, None
         
+        try:
+            encoded_size = os.stat(temp_file).st_size
+        except FileNotFoundError:
+            return None, None
+        os.replace(temp_file, output_file)
+        encoded = True
+
         # Final status report
         print("\nEncoding completed")
-        return (output_file, calculate_size_reduction(input_file, output_file)) if os.path.exists(output_file) else (None, None)
+        return output_file, calculate_size_reduction(original_size, encoded_size)
     
     except Exception as e:
         print(f"Encoding failed: {str(e)}")
         return None, None
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        # Release the reserved name if nothing was encoded into it
+        if not encoded:
+            try:
+                os.unlink(output_file)
+            except OSError:
+                pass
 
-def calculate_size_reduction(original, encoded):
-    """Calculate and format file size reduction statistics"""
-    original_size = os.path.getsize(original)
-    encoded_size = os.path.getsize(encoded)
+def relay_stderr(stream, progress_log):
+    """Echo FFmpeg's log messages to the terminal, keeping recent ones for the log file"""
+    for line in stream:
+        if progress_log is not None:
+            progress_log.append(line)
+        sys.stderr.write(line.decode("utf-8", "replace"))
+
+def claim_path(path, suffixes):
+    """Atomically reserve an unused path, trying each suffix (before the extension) when the name is taken"""
+    base, ext = os.path.splitext(path)
+    for candidate in itertools.chain([path], (f"{base}{suffix}{ext}" for suffix in suffixes)):
+        try:
+            # O_EXCL makes the check-and-create atomic across parallel workers
+            os.close(os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return candidate
+        except FileExistsError:
+            continue
+
+def claim_output_file(output_file):
+    """Atomically reserve an unused output path, adding a counter when the name is taken"""
+    return claim_path(output_file, (f" ({counter})" for counter in itertools.count(2)))
+
+def calculate_size_reduction(original_size, encoded_size):
+    """Calculate and format file size reduction statistics from sizes in bytes"""
     reduction = (original_size - encoded_size) / original_size * 100
     
-    return f"""Original: {original_size/(1024**2):.1f}MB
-Encoded: {encoded_size/(1024**2):.1f}MB
+    return f"""Original: {original_size / _MB:.1f}MB
+Encoded: {encoded_size / _MB:.1f}MB
 Reduction: {reduction:.1f}%"""
 
 def format_duration(seconds):
     """Convert seconds (float) to HH:MM:SS format with leading zeros."""
-    if not seconds:
-        return "00:00:00"
-    hours = int(seconds) // 3600
-    minutes = (int(seconds) % 3600) // 60
-    seconds = int(seconds) % 60
+    hours, seconds = divmod(int(seconds or 0), _SEC_PER_HOUR)
+    minutes, seconds = divmod(seconds, 60)
     return f"{hours:02}:{minutes:02}:{seconds:02}"
 
+def get_output_stems(videos):
+    """Output name stem for each input, qualified by folder (then extension) where names clash"""
+    def qualified(video, keep_suffix):
+        try:
+            relative = Path(os.path.relpath(video))
+        except ValueError:
+            # Different drive on Windows: use the path without its drive/root
+            relative = Path(*video.parts[1:]) if video.anchor else video
+        if not keep_suffix:
+            relative = relative.with_suffix("")
+        name = "_".join(part for part in relative.parts if part != os.pardir)
+        return name.replace(".", "_") if keep_suffix else name
+
+    stems = {video: video.stem for video in videos}
+    # e.g. a/x.mp4 and b/x.mp4 become "a_x" and "b_x"; x.mp4 and x.mkv become "x_mp4" and "x_mkv"
+    for keep_suffix in (False, True):
+        counts = collections.Counter(stems.values())
+        for video in videos:
+            if counts[stems[video]] > 1:
+                stems[video] = qualified(video, keep_suffix)
+    return stems
+
+def get_input_size(path):
+    """Size of an input video in bytes, or None if it is missing or not a regular file"""
+    try:
+        path_stat = path.stat()
+    except OSError:
+        return None
+    return path_stat.st_size if stat.S_ISREG(path_stat.st_mode) else None
+
 def get_recycle_bin_path():
     """Get platform-appropriate recycle bin or trash directory path"""
     system = platform.system()
@@ -371,36 +643,94 @@ def get_recycle_bin_path():
     else:  # Linux
         return os.path.join(Path.home(), ".local", "share", "Trash", "files")
 
-def encode_and_log(video_name, input_path, output_path, encoding_command, crf, preset, keyframe_interval, gpu_acceleration, max_bitrate, move_to_recycle_bin):
+def move_file(source, destination):
+    """Move a file, renaming in place when possible and copying only across filesystems"""
+    windows = platform.system() == "Windows"
+    try:
+        # Same filesystem: a metadata-only rename, regardless of file size
+        os.rename(source, destination)
+        return
+    except FileExistsError:
+        # Windows refuses to rename onto an existing file; replace it like shutil.move did
+        if not windows:
+            raise
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+
+    if windows:
+        MOVEFILE_REPLACE_EXISTING = 0x1
+        MOVEFILE_COPY_ALLOWED = 0x2
+        if not ctypes.windll.kernel32.MoveFileExW(source, destination, MOVEFILE_REPLACE_EXISTING | MOVEFILE_COPY_ALLOWED):
+            raise ctypes.WinError()
+        return
+
+    # Across filesystems copyfile uses the kernel's zero-copy path (sendfile/fcopyfile) where available
+    shutil.copy2(source, destination)
+    os.unlink(source)
+
+def encode_and_log(video_name, input_path, output_path, encoding_command, crf, preset, keyframe_interval, gpu_vendor, max_bitrate, move_to_recycle_bin, parallel_jobs=1, original_size=None, video_info=None, output_stem=None):
     """Handle encoding lifecycle with logging and file management"""
-    output_file, log = encode_video(video_name, input_path, output_path, encoding_command, crf, preset, keyframe_interval, gpu_acceleration, max_bitrate)
+    # Single probe point: reuse the batch probe when given, so encode_video only runs FFmpeg
+    if video_info is None:
+        print("Analyzing video to calculate total frames...")
+        video_info = get_video_info(find_tools()["ffprobe"], os.path.join(input_path, video_name))
     
-    if output_file and log:
-        log_file_path = os.path.join(output_path, f"{Path(output_file).stem}.log")
-        with open(log_file_path, "w", encoding="utf-8") as log_file:
-            log_file.write(log)
-        
-        if move_to_recycle_bin:
+    progress_log = collections.deque(maxlen=2000)
+    output_file, log = encode_video(video_name, input_path, output_path, encoding_command, crf, preset, keyframe_interval, gpu_vendor, max_bitrate, parallel_jobs, original_size, video_info=video_info, output_stem=output_stem, progress_log=progress_log)
+    
+    succeeded = bool(output_file and log)
+    # Failed encodes get a log too, so FFmpeg's errors can be looked at afterwards
+    if succeeded or progress_log:
+        if succeeded:
+            log_file_path = os.path.join(output_path, f"{Path(output_file).stem}.log")
+        else:
+            log = "Encoding failed"
+            log_file_path = os.path.join(output_path, f"{output_stem or Path(video_name).stem} encoded av1 failed.log")
+        # Summary and FFmpeg output history go out in a single buffered write
+        with open(log_file_path, "w", encoding="utf-8", buffering=1 << 16) as log_file:
+            log_file.writelines([
+                log,
+                "\n\nFFmpeg output (most recent lines):\n",
+                *(line.decode("utf-8", "replace") for line in progress_log)
+            ])
+        if not succeeded:
+            print(f"FFmpeg output saved to: {log_file_path}")
+    
+    if succeeded and move_to_recycle_bin:
+        try:
+            # Get platform-appropriate recycle bin path
+            recycle_bin_dir = get_recycle_bin_path()
+            os.makedirs(recycle_bin_dir, exist_ok=True)
+            
+            original_file = os.path.join(input_path, video_name)
+            file_name = os.path.basename(video_name)
+            
+            # Reserve the name atomically, adding a suffix if a file with the same name is
+            # already in the recycle bin or claimed by a parallel worker
+            suffixes = itertools.chain(["_old"], (f"_old{counter}" for counter in itertools.count(2)))
+            destination_file = claim_path(os.path.join(recycle_bin_dir, file_name), suffixes)
             try:
-                # Get platform-appropriate recycle bin path
-                recycle_bin_dir = get_recycle_bin_path()
-                os.makedirs(recycle_bin_dir, exist_ok=True)
-                
-                original_file = os.path.join(input_path, video_name)
-                destination_file = os.path.join(recycle_bin_dir, video_name)
-                
-                # If a file with the same name exists in the recycle bin, add a suffix
-                if os.path.exists(destination_file):
-                    base, ext = os.path.splitext(video_name)
-                    destination_file = os.path.join(recycle_bin_dir, f"{base}_old{ext}")
-                
-                shutil.move(original_file, destination_file)
-                print(f"Moved '{video_name}' to the recycle bin at: {recycle_bin_dir}")
-            except Exception as e:
-                print(f"Move failed: {e}")
+                move_file(original_file, destination_file)
+            except Exception:
+                # Release the reservation so no empty placeholder is left behind
+                os.unlink(destination_file)
+                raise
+            print(f"Moved '{video_name}' to the recycle bin at: {recycle_bin_dir}")
+        except Exception as e:
+            print(f"Move failed: {e}")
 
 # Main execution flow
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cross-platform video encoding tool (HEVC/AV1)")
+    parser.add_argument("--inputs", nargs="+", default=[], metavar="PATH", help="Video files to encode")
+    parser.add_argument("--glob", action="append", default=[], metavar="PATTERN", help="Glob pattern for videos to encode, e.g. '*.mp4' or '**/*.mkv' (repeatable)")
+    parser.add_argument("--threads", type=positive_int, help="Maximum encoder threads per video (overrides ENCODER_THREADS)")
+    args = parser.parse_args()
+    # Stored in the environment so parallel worker processes inherit it
+    if args.threads is not None:
+        os.environ["ENCODER_THREADS"] = str(args.threads)
+
     print("Cross-Platform Video Encoding Tool v2.2 - Supports HEVC/AV1 Conversion")
     print("--------------------------------------------------------")
     print("This tool will help you convert video files to efficient AV1 or HEVC format")
@@ -408,22 +738,44 @@ if __name__ == "__main__":
     print("--------------------------------------------------------")
     
     videos = []
+    video_sizes = {}
     
     # Collect input files with improved prompts
     print("\nSTEP 1: Select video files to convert")
-    print("Enter video filenames one by one. Make sure the files are in the current directory.")
-    while True:
-        video = input("Enter filename (with extension) or press Enter when done: ").strip()
-        if not video:
-            break
-        
-        # Verify file exists before adding
-        if not os.path.isfile(video):
-            print(f"Warning: '{video}' not found in the current directory. Please check the filename.")
-            continue
+    if args.inputs or args.glob:
+        # Files from the command line, with glob patterns expanded in order and duplicates dropped
+        explicit_inputs = [Path(path) for path in args.inputs]
+        candidates = list(explicit_inputs)
+        for pattern in args.glob:
+            candidates += sorted(Path(path) for path in glob.iglob(pattern, recursive=True))
+        for video in dict.fromkeys(candidates):
+            # Keep the size so the file is not stat'ed again later
+            size = get_input_size(video)
+            if size is None:
+                # Directories matched by a glob are skipped silently
+                if video in explicit_inputs:
+                    print(f"Warning: '{video}' not found. Please check the filename.")
+                continue
+            videos.append(video)
+            video_sizes[video] = size
+            print(f"Added: {video}")
+    else:
+        print("Enter video filenames one by one. Make sure the files are in the current directory.")
+        while True:
+            video = input("Enter filename (with extension) or press Enter when done: ").strip()
+            if not video:
+                break
             
-        videos.append(video)
-        print(f"Added: {video}")
+            # Verify file exists before adding; keep the size so it is not stat'ed again later
+            video = Path(video)
+            size = get_input_size(video)
+            if size is None:
+                print(f"Warning: '{video}' not found in the current directory. Please check the filename.")
+                continue
+                
+            videos.append(video)
+            video_sizes[video] = size
+            print(f"Added: {video}")
     
     if not videos:
         sys.exit("No files provided. Exiting...")
@@ -463,8 +815,8 @@ if __name__ == "__main__":
 
     # System setup
     print("\nSTEP 3: System configuration")
-    ffmpeg_path = find_ffmpeg_path()
-    gpu_available = check_gpu_acceleration(ffmpeg_path)
+    tools = find_tools()
+    gpu_vendor = check_gpu_acceleration(tools["ffmpeg"], codec)
     
     print("\nOriginal files can be moved to the recycle bin/trash after successful conversion.")
     recycle = input("Move originals to recycle bin after encoding? (Y/N) [N]: ").upper() == "Y"
@@ -475,8 +827,30 @@ if __name__ == "__main__":
 
     # Process each video
     print("\nSTEP 4: Beginning conversion process")
-    for i, video in enumerate(videos):
-        print(f"\nProcessing file {i+1}/{len(videos)}: {video}")
-        encode_and_log(video, os.getcwd(), os.getcwd(), codec, crf, preset, keyframe, gpu_available, max_bitrate, recycle)
+    print("Analyzing videos to calculate total frames...")
+    video_infos = probe_all(tools["ffprobe"], videos)
+    output_stems = get_output_stems(videos)
+    parallel_jobs = min(len(videos), get_worker_count(codec, gpu_vendor))
+    if parallel_jobs == 1:
+        for i, video in enumerate(videos):
+            print(f"\nProcessing file {i+1}/{len(videos)}: {video}")
+            encode_and_log(video, os.getcwd(), os.getcwd(), codec, crf, preset, keyframe, gpu_vendor, max_bitrate, recycle, original_size=video_sizes[video], video_info=video_infos[video], output_stem=output_stems[video])
+    else:
+        print(f"Encoding {parallel_jobs} files at a time")
+        with ProcessPoolExecutor(max_workers=parallel_jobs, initializer=init_worker, initargs=(tools,)) as executor:
+            futures = {
+                executor.submit(
+                    encode_and_log, video, os.getcwd(), os.getcwd(), codec, crf, preset, keyframe, gpu_vendor, max_bitrate, recycle,
+                    parallel_jobs, original_size=video_sizes[video], video_info=video_infos[video],
+                    output_stem=output_stems[video]
+                ): video
+                for video in videos
+            }
+            for i, future in enumerate(as_completed(futures)):
+                try:
+                    future.result()
+                    print(f"\nFinished file {i+1}/{len(videos)}: {futures[future]}")
+                except Exception as e:
+                    print(f"\nProcessing '{futures[future]}' failed: {e}")
     
     print("\nAll processing complete! Encoded files have been saved to the current directory.")
\ No newline at end of file